@@ -283,12 +283,7 @@ class DDPG(object):
     # Calculate and return the Critic loss, Actor loss, Critic's gradient and Actor's gradient in the batch
     def _grads(self):
         # Avoid feed_dict here for performance
-        critic_loss, actor_loss, Q_grad, pi_grad = self.sess.run([
-            self.Q_loss_tf,
-            self.main.Q_pi_tf,
-            self.Q_grad_tf,
-            self.pi_grad_tf
-        ])
+        critic_loss, actor_loss, Q_grad, pi_grad = self.sess.run(self.grads_tf)
         return critic_loss, actor_loss, Q_grad, pi_grad
 
     # Based on the gradient of Critic and the gradient of Actor, update the corresponding network parameters
@@ -302,10 +297,7 @@ class DDPG(object):
             global DEMO_BUFFER
             transitions_demo = DEMO_BUFFER.sample(self.demo_batch_size) #sample from the demo buffer
             for k, values in transitions_demo.items():
-                rolloutV = transitions[k].tolist()
-                for v in values:
-                    rolloutV.append(v.tolist())
-                transitions[k] = np.array(rolloutV)
+                transitions[k] = np.concatenate([transitions[k], values])
         else:
              # otherwise only sample from primary buffer
             transitions = self.buffer.sample(self.batch_size) 
@@ -331,6 +323,23 @@ class DDPG(object):
         self._update(Q_grad, pi_grad)
         return critic_loss, actor_loss
 
+    # Train 'n_batches' batches in a row. The next batch is staged in the same session call
+    # that computes the gradients of the current one, so each batch costs one session call instead of two.
+    # 'stage_after_get_op' only puts the next batch once the current one has been taken out of the staging area.
+    def train_n(self, n_batches):
+        if n_batches <= 0:
+            return None
+        self.stage_batch()
+        for i in range(n_batches):
+            if i < n_batches - 1:
+                feed = dict(zip(self.buffer_ph_tf, self.sample_batch()))
+                critic_loss, actor_loss, Q_grad, pi_grad, _ = self.sess.run(
+                    self.grads_tf + [self.stage_after_get_op], feed_dict=feed)
+            else:
+                critic_loss, actor_loss, Q_grad, pi_grad = self.sess.run(self.grads_tf)
+            self._update(Q_grad, pi_grad)
+        return critic_loss, actor_loss
+
     def _init_target_net(self):
         self.sess.run(self.init_target_net_op)
 
@@ -365,6 +374,10 @@ class DDPG(object):
 
         # mini-batch sampling.
         batch = self.staging_tf.get()
+        # StagingArea has no ordering guarantees between a get and a put in the same session call,
+        # so this put waits for the get to finish and can stage the next batch while the current one is trained.
+        with tf.control_dependencies(batch):
+            self.stage_after_get_op = self.staging_tf.put(self.buffer_ph_tf)
         batch_tf = OrderedDict([(key, batch[i])
                                 for i, key in enumerate(self.stage_shapes.keys())])
         batch_tf['r'] = tf.reshape(batch_tf['r'], [-1, 1])
@@ -421,8 +434,13 @@ class DDPG(object):
         self.pi_grads_vars_tf = zip(pi_grads_tf, self._vars('main/pi'))
         self.Q_grad_tf = flatten_grads(grads=Q_grads_tf, var_list=self._vars('main/Q'))
         self.pi_grad_tf = flatten_grads(grads=pi_grads_tf, var_list=self._vars('main/pi'))
+        # Critic loss, actor loss, Critic's gradient and Actor's gradient of the staged batch
+        self.grads_tf = [self.Q_loss_tf, self.main.Q_pi_tf, self.Q_grad_tf, self.pi_grad_tf]
 
         # optimizers
+        # MpiAdam sums the flattened gradients with a float32 Allreduce every batch (scale_grad_by_procs=False).
+        # They are not sent as float16: MPI has no portable half-precision SUM, and a Python-level
+        # reduction op would cost more than the saved bandwidth for gradients of this size.
         self.Q_adam = MpiAdam(self._vars('main/Q'), scale_grad_by_procs=False)
         self.pi_adam = MpiAdam(self._vars('main/pi'), scale_grad_by_procs=False)
 
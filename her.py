@@ -2,110 +2,159 @@ import os
 import click
 import numpy as np
 import json
+from concurrent.futures import ThreadPoolExecutor
 from mpi4py import MPI
 from baselines import logger
 from baselines.common import set_global_seeds, tf_util
-from baselines.common.mpi_moments import mpi_moments
 import baselines.her.experiment.config as config
 from baselines.her.rollout import RolloutWorker
 
-
-# Calculates the average of the given 'value' 
-# and communicates and synchronizes it between multiple MPI processes.
-def mpi_average(value):
-    if not isinstance(value, list):
-        value = [value]
-    if not any(value):
-        value = [0.]
-    return mpi_moments(np.array(value))[0]
+# MPI is initialized when mpi4py.MPI is imported, so the rank of this process
+# and the number of processes can be queried once and reused.
+_COMM = MPI.COMM_WORLD
+_RANK = _COMM.Get_rank()
+_SIZE = _COMM.Get_size()
+
+# Creates a persistent in-place Allreduce request bound to the float64 buffer 'values' (MPI-4),
+# so that repeated reductions of the same buffer skip the setup of a new collective.
+# Returns None if the MPI library or mpi4py does not support persistent collectives.
+def mpi_average_batch_init(values):
+    try:
+        return _COMM.Allreduce_init(MPI.IN_PLACE, values, op=MPI.SUM)
+    except (AttributeError, NotImplementedError):
+        return None
+
+# Averages every entry of the float64 buffer 'values' in place between multiple MPI processes,
+# using a single Allreduce instead of one collective per entry.
+# If 'request' is a persistent request from mpi_average_batch_init(values), it is started instead.
+def mpi_average_batch(values, request=None):
+    if request is None:
+        _COMM.Allreduce(MPI.IN_PLACE, values, op=MPI.SUM)
+    else:
+        request.Start()
+        request.Wait()
+    values /= _SIZE
+    return values
 
 # Train the policy
 def train(*, policy, rollout_worker, evaluator,
           n_epochs, n_test_rollouts, n_cycles, n_batches, policy_save_interval,
           save_path, demo_file, **kwargs):
     # Get the current process rank from the MPI's process No.
-    rank = MPI.COMM_WORLD.Get_rank()
+    rank = _RANK
 
     # Define the path of latest policy, best policy, periodic policy
     if save_path:
         latest_policy_path = os.path.join(save_path, 'policy_latest.pkl')
         best_policy_path = os.path.join(save_path, 'policy_best.pkl')
         periodic_policy_path = os.path.join(save_path, 'policy_{}.pkl')
+    # Only the process of rank 0 saves policies, and only if a save path is given
+    save_policies = rank == 0 and bool(save_path)
+    save_periodic_policies = save_policies and policy_save_interval > 0
 
     logger.info("Training...")
     # Initial variables
     # Setting the initial value to '-1' is to ensure the first "success rate" during the training will be cosidered as the "best success rate",
     # since any "success rate" higher than '-1' will considered better.
     best_success_rate = -1
+    # keys and values of the per-epoch logs and the persistent request reducing them, created in the first epoch
+    log_keys, log_values, log_req = None, None, None
 
     # Initial demo buffer if the policy requires the use of behavior clone loss --> 'policy.bc_loss ==1'
     if policy.bc_loss == 1: policy.init_demo_buffer(demo_file)
 
-
-    # Start training
-    # num_timesteps = n_epochs * n_cycles * rollout_length * number of rollout workers
-    for epoch in range(n_epochs):
-    
-        # clear history rollout(trajectory) record
-        rollout_worker.clear_history()
-        
-        for _ in range(n_cycles):
-            # generate rollouts and store them in the experience replay buffer
-            episode = rollout_worker.generate_rollouts()
-            policy.store_episode(episode)
-            
-            # training multiple batches(n_batches) and update the target network
-            for _ in range(n_batches):
-                policy.train()
-            policy.update_target_net()
-
-        # test
-        logger.info("Testing")
-        # clear history rollouts record and generate new rollouts
+    # clear history rollouts record and generate new rollouts for the test phase
+    def test_rollouts():
         evaluator.clear_history()
         for _ in range(n_test_rollouts):
             evaluator.generate_rollouts()
 
-        # record logs
-        logger.record_tabular('epoch', epoch)
+    # buffer of the per-epoch seed check, reused across epochs
+    root_uniform = np.empty(1)
+    bcast_req = None
+
+    try:
+        # Start training
+        # num_timesteps = n_epochs * n_cycles * rollout_length * number of rollout workers
+        for epoch in range(n_epochs):
+    
+            # clear history rollout(trajectory) record
+            rollout_worker.clear_history()
+
+            # make sure that different threads have different seeds.
+            # The broadcast is non-blocking so that it overlaps with the training cycles of this epoch.
+            # The local value is kept as a scalar, and the buffer is overwritten in place with the value of rank 0.
+            local_uniform = np.random.uniform()
+            root_uniform[0] = local_uniform
+            bcast_req = _COMM.Ibcast(root_uniform, root=0)
         
-        # record log of test phase
-        for key, val in evaluator.logs('test'):
-            logger.record_tabular(key, mpi_average(val))
-            
-        # record log of train phase
-        for key, val in rollout_worker.logs('train'):
-            logger.record_tabular(key, mpi_average(val))
+            for _ in range(n_cycles):
+                # generate rollouts and store them in the experience replay buffer
+                episode = rollout_worker.generate_rollouts()
+                policy.store_episode(episode)
             
-        # record log of policy 
-        for key, val in policy.logs():
-            logger.record_tabular(key, mpi_average(val))
-
-        # print logs out if the ranking of current process is 0.
-        if rank == 0:
-            logger.dump_tabular()
-
-        # save the policy if it's better than the previous ones
-        success_rate = mpi_average(evaluator.current_success_rate())
+                # training multiple batches(n_batches) and update the target network
+                policy.train_n(n_batches)
+                policy.update_target_net()
+                # drive the progress of the pending broadcast
+                bcast_req.Test()
+
+            # test
+            logger.info("Testing")
+            if save_periodic_policies and epoch % policy_save_interval == 0:
+                # the periodic policy doesn't depend on the test results,
+                # so it's saved while the test rollouts run in a background thread
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    test_future = executor.submit(test_rollouts)
+                    policy_path = periodic_policy_path.format(epoch)
+                    logger.info('Saving periodic policy to {} ...'.format(policy_path))
+                    evaluator.save_policy(policy_path)
+                    test_future.result()
+            else:
+                test_rollouts()
+            train_log_items = rollout_worker.logs('train') + policy.logs()
+
+            # collect the logs of test phase, train phase and policy, plus the success rate,
+            # into a single float64 buffer so that they can be averaged between processes with one Allreduce.
+            # The set of log keys is fixed during training, so the buffer is allocated once and reused.
+            log_items = evaluator.logs('test') + train_log_items
+            if log_values is None:
+                log_keys = [key for key, _ in log_items]
+                log_values = np.empty(len(log_items) + 1, dtype=np.float64)
+                log_req = mpi_average_batch_init(log_values)
+            for i, (_, val) in enumerate(log_items):
+                log_values[i] = val
+            log_values[-1] = evaluator.current_success_rate()
+            mpi_average_batch(log_values, log_req)
+
+            # record logs and print them out if the ranking of current process is 0.
+            # The other processes only take part in the Allreduce above.
+            if rank == 0:
+                logger.record_tabular('epoch', epoch)
+                for key, val in zip(log_keys, log_values):
+                    logger.record_tabular(key, val)
+                logger.dump_tabular()
+
+            # save the policy if it's better than the previous ones
+            success_rate = log_values[-1]
         
-        if rank == 0 and success_rate >= best_success_rate and save_path:
-            best_success_rate = success_rate
-            logger.info('New best success rate: {}. Saving policy to {} ...'.format(best_success_rate, best_policy_path))
-            evaluator.save_policy(best_policy_path)
-            evaluator.save_policy(latest_policy_path)
-        if rank == 0 and policy_save_interval > 0 and epoch % policy_save_interval == 0 and save_path:
-            policy_path = periodic_policy_path.format(epoch)
-            logger.info('Saving periodic policy to {} ...'.format(policy_path))
-            evaluator.save_policy(policy_path)
-
-        # make sure that different threads have different seeds
-        logger.info("The best success rate so far ", best_success_rate)
-        local_uniform = np.random.uniform(size=(1,))
-        root_uniform = local_uniform.copy()
-        MPI.COMM_WORLD.Bcast(root_uniform, root=0)
+            if save_policies and success_rate >= best_success_rate:
+                best_success_rate = success_rate
+                logger.info('New best success rate: {}. Saving policy to {} ...'.format(best_success_rate, best_policy_path))
+                evaluator.save_policy(best_policy_path, latest_policy_path)
+
+            if rank == 0:
+                logger.info(f"The best success rate so far {best_success_rate}")
+            bcast_req.Wait()
         
-        if rank != 0:
-            assert local_uniform[0] != root_uniform[0]
+            if rank != 0:
+                assert local_uniform != root_uniform[0]
+    finally:
+        # complete the pending broadcast and release the persistent request even if training is interrupted by an exception
+        if bcast_req is not None:
+            bcast_req.Wait()
+        if log_req is not None:
+            log_req.Free()
 
     return policy
 
@@ -128,8 +177,8 @@ def learn(*, network, env, total_timesteps,
     
     override_params = override_params or {}
     if MPI is not None:
-        rank = MPI.COMM_WORLD.Get_rank()
-        num_cpu = MPI.COMM_WORLD.Get_size()
+        rank = _RANK
+        num_cpu = _SIZE
 
     # Seed everything.
     rank_seed = seed + 1000000 * rank if seed is not None else None
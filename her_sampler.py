@@ -17,6 +17,9 @@ def make_sample_her_transitions(replay_strategy, replay_k, reward_fun):
     else:  # 'replay_strategy' == 'none'
         future_p = 0
 
+    # PCG64 generator for the sampling indices, seeded from the global RNG so that set_global_seeds still applies
+    rng = np.random.default_rng(np.random.randint(2**31 - 1))
+
     def _sample_her_transitions(episode_batch, batch_size_in_transitions):
         """episode_batch is {key: array(buffer_size x T x dim_key)}
         """
@@ -27,15 +30,15 @@ def make_sample_her_transitions(replay_strategy, replay_k, reward_fun):
         batch_size = batch_size_in_transitions
 
         # select which episodes and time steps to use.
-        episode_idxs = np.random.randint(0, rollout_batch_size, batch_size)
-        t_samples = np.random.randint(T, size=batch_size)
+        episode_idxs = rng.integers(0, rollout_batch_size, batch_size)
+        t_samples = rng.integers(T, size=batch_size)
         transitions = {key: episode_batch[key][episode_idxs, t_samples].copy()
                        for key in episode_batch.keys()}
 
         # Select future time indexes proportional with probability future_p.
         # These will be used for HER replay by substituting in future goals.
-        her_indexes = np.where(np.random.uniform(size=batch_size) < future_p)
-        future_offset = np.random.uniform(size=batch_size) * (T - t_samples)
+        her_indexes = np.where(rng.random(batch_size) < future_p)
+        future_offset = rng.random(batch_size) * (T - t_samples)
         future_offset = future_offset.astype(int)
         future_t = (t_samples + 1 + future_offset)[her_indexes]
 
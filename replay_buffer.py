@@ -19,7 +19,8 @@ class ReplayBuffer:
         self.sample_transitions = sample_transitions
 
         # self.buffers is {key: array(size_in_episodes x T or T+1 x dim_key)}
-        self.buffers = {key: np.empty([self.size, *shape])
+        # stored as float32, the dtype of the staging area that the sampled batches are fed into
+        self.buffers = {key: np.empty([self.size, *shape], dtype=np.float32)
                         for key, shape in buffer_shapes.items()}
 
         # memory management
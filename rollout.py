@@ -1,9 +1,32 @@
-from collections import deque
 import numpy as np
 import pickle
 from baselines.her.util import convert_episode_to_batch_major, store_args
 
 
+# Fixed-capacity ring buffer of scalar statistics.
+# Clearing it only resets the cursor, so the storage is allocated once and reused across epochs.
+class _History:
+    def __init__(self, maxlen):
+        self.values = np.empty(maxlen)
+        self.head = 0
+        self.count = 0
+
+    def append(self, value):
+        # like a deque with maxlen=0, a history of length 0 keeps nothing
+        if len(self.values) == 0:
+            return
+        self.values[self.head] = value
+        self.head = (self.head + 1) % len(self.values)
+        self.count = min(self.count + 1, len(self.values))
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+
+    def mean(self):
+        return np.mean(self.values[:self.count])
+
+
 # interact with env to generate the training data.
 class RolloutWorker:
 
@@ -33,8 +56,8 @@ class RolloutWorker:
 
         self.info_keys = [key.replace('info_', '') for key in dims.keys() if key.startswith('info_')]
 
-        self.success_history = deque(maxlen=history_len)
-        self.Q_history = deque(maxlen=history_len)
+        self.success_history = _History(history_len)
+        self.Q_history = _History(history_len)
 
         self.n_episodes = 0
         self.reset_all_rollouts()
@@ -141,24 +164,27 @@ class RolloutWorker:
         self.Q_history.clear()
 
     def current_success_rate(self):
-        return np.mean(self.success_history)
+        return self.success_history.mean()
 
     def current_mean_Q(self):
-        return np.mean(self.Q_history)
+        return self.Q_history.mean()
 
-    def save_policy(self, path):
-        """Pickles the current policy for later inspection.
+    def save_policy(self, path, *extra_paths):
+        """Pickles the current policy for later inspection. The policy is serialized only once,
+        even if it is written to several paths.
         """
-        with open(path, 'wb') as f:
-            pickle.dump(self.policy, f)
+        data = pickle.dumps(self.policy)
+        for p in (path,) + extra_paths:
+            with open(p, 'wb') as f:
+                f.write(data)
 
     def logs(self, prefix='worker'):
         """Generates a dictionary that contains all collected statistics.
         """
         logs = []
-        logs += [('success_rate', np.mean(self.success_history))]
+        logs += [('success_rate', self.success_history.mean())]
         if self.compute_Q:
-            logs += [('mean_Q', np.mean(self.Q_history))]
+            logs += [('mean_Q', self.Q_history.mean())]
         logs += [('episode', self.n_episodes)]
 
         if prefix != '' and not prefix.endswith('/'):